@@ -0,0 +1,38 @@
+# src/_lazy.py
+import sys
+import importlib
+import threading
+
+def cached_import(module_name, attr):
+    """Return module_name.attr, importing the module only if not yet loaded"""
+    module = sys.modules.get(module_name)
+    spec = getattr(module, "__spec__", None)
+    # A module still being imported by another thread is in sys.modules but
+    # incomplete; import_module waits for that import to finish
+    if spec is None or getattr(spec, "_initializing", False):
+        module = importlib.import_module(module_name)
+    return getattr(module, attr)
+
+class LazyObject:
+    """Proxy that builds the wrapped object on first attribute access"""
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_wrapped', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+        
+    def _materialize(self):
+        wrapped = object.__getattribute__(self, '_wrapped')
+        if wrapped is None:
+            # Worker threads may touch the proxy first, so build it only once
+            with object.__getattribute__(self, '_lock'):
+                wrapped = object.__getattribute__(self, '_wrapped')
+                if wrapped is None:
+                    wrapped = object.__getattribute__(self, '_factory')()
+                    object.__setattr__(self, '_wrapped', wrapped)
+        return wrapped
+        
+    def __getattr__(self, name):
+        return getattr(self._materialize(), name)
+        
+    def __setattr__(self, name, value):
+        setattr(self._materialize(), name, value)
@@ -0,0 +1,171 @@
+# src/kernels.py
+import sys
+import numpy as np
+
+try:
+    from numba import njit, prange, types
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+# Numba's on-disk cache needs the .py source next to it, which a frozen
+# (PyInstaller) build does not ship; there the kernels compile on import
+_CACHE = not getattr(sys, 'frozen', False)
+
+# Guards the cotangent against degenerate (zero-area) triangles
+_EPS = 1e-12
+
+# Faces per block in the NumPy fallback, small enough that the per-block
+# temporaries stay in cache
+_FALLBACK_BLOCK = 1024
+
+
+def _cotan_weights_numpy(V, F, out_rows, out_cols, out_vals):
+    """Vectorized fallback used when Numba is not installed"""
+    for start in range(0, F.shape[0], _FALLBACK_BLOCK):
+        stop = min(start + _FALLBACK_BLOCK, F.shape[0])
+        _cotan_weights_block(V, F[start:stop], out_rows[3 * start:3 * stop],
+                             out_cols[3 * start:3 * stop], out_vals[3 * start:3 * stop])
+
+
+def _cotan_weights_block(V, F, out_rows, out_cols, out_vals):
+    """Cotangent weights of one face block, written into output views"""
+    # Twice the face area is shared by all three corners; compute it once
+    n = np.cross(V[F[:, 1]] - V[F[:, 0]], V[F[:, 2]] - V[F[:, 0]])
+    cross = np.maximum(np.sqrt(np.einsum('ij,ij->i', n, n)), _EPS)
+    for c in range(3):
+        i = F[:, (c + 1) % 3]
+        j = F[:, (c + 2) % 3]
+        a = V[i] - V[F[:, c]]
+        b = V[j] - V[F[:, c]]
+        out_rows[c::3] = i
+        out_cols[c::3] = j
+        out_vals[c::3] = 0.5 * np.einsum('ij,ij->i', a, b) / cross
+
+
+if HAVE_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=_CACHE)
+    def _cotan_weights_numba(V, F, out_rows, out_cols, out_vals):
+        for f in prange(F.shape[0]):
+            # Twice the face area, shared by all three corners
+            p, q, r = F[f, 0], F[f, 1], F[f, 2]
+            ux = V[q, 0] - V[p, 0]
+            uy = V[q, 1] - V[p, 1]
+            uz = V[q, 2] - V[p, 2]
+            vx = V[r, 0] - V[p, 0]
+            vy = V[r, 1] - V[p, 1]
+            vz = V[r, 2] - V[p, 2]
+            cx = uy * vz - uz * vy
+            cy = uz * vx - ux * vz
+            cz = ux * vy - uy * vx
+            cross = max(np.sqrt(cx * cx + cy * cy + cz * cz), _EPS)
+            for c in range(3):
+                k = F[f, c]
+                i = F[f, (c + 1) % 3]
+                j = F[f, (c + 2) % 3]
+                ax = V[i, 0] - V[k, 0]
+                ay = V[i, 1] - V[k, 1]
+                az = V[i, 2] - V[k, 2]
+                bx = V[j, 0] - V[k, 0]
+                by = V[j, 1] - V[k, 1]
+                bz = V[j, 2] - V[k, 2]
+                out_rows[3 * f + c] = i
+                out_cols[3 * f + c] = j
+                out_vals[3 * f + c] = 0.5 * (ax * bx + ay * by + az * bz) / cross
+
+
+def cotan_weights(vertices, faces, dtype=np.float64):
+    """Half-cotangent weight of the edge opposite every triangle corner
+
+    Returns COO triples (rows, cols, vals) with three entries per face.
+    Indices are int32, the index type SciPy uses for sparse matrices of
+    this size, so assembly does not downcast a copy of them. The geometry
+    and weights are computed in dtype.
+    """
+    V = np.ascontiguousarray(vertices, dtype=dtype)
+    F = np.ascontiguousarray(faces, dtype=np.int64)
+    n = 3 * F.shape[0]
+    out_rows = np.empty(n, dtype=np.int32)
+    out_cols = np.empty(n, dtype=np.int32)
+    out_vals = np.empty(n, dtype=dtype)
+
+    if HAVE_NUMBA:
+        _cotan_weights_numba(V, F, out_rows, out_cols, out_vals)
+    else:
+        _cotan_weights_numpy(V, F, out_rows, out_cols, out_vals)
+    return out_rows, out_cols, out_vals
+
+
+if HAVE_NUMBA:
+    @njit(fastmath=True, cache=_CACHE)
+    def _stretch_numba(x, y, sx, sy, out_x, out_y):
+        for i in range(x.shape[0]):
+            out_x[i] = x[i] / sx
+            out_y[i] = y[i] / sy
+
+
+def stretch_compensate(x, y, sx, sy, out_x, out_y):
+    """Divide planar coordinates by the fabric stretch into preallocated buffers"""
+    if HAVE_NUMBA:
+        _stretch_numba(x, y, float(sx), float(sy), out_x, out_y)
+    else:
+        np.divide(x, sx, out=out_x)
+        np.divide(y, sy, out=out_y)
+
+
+def _one_ring_numpy(V, indptr, indices, min_neighbors, out):
+    """Vectorized fallback used when Numba is not installed"""
+    counts = np.diff(indptr)
+    owners = np.repeat(np.arange(len(counts)), counts)
+    diffs = V[indices] - V[owners]
+    lengths = np.einsum('ij,ij->i', diffs, diffs)
+    np.sqrt(lengths, out=lengths)
+    sums = np.bincount(owners, weights=lengths, minlength=len(counts))
+    ok = counts >= min_neighbors
+    out[ok] = sums[ok] / counts[ok]
+
+
+if HAVE_NUMBA:
+    # Explicit signature: compiled (or loaded from the cache) when this module
+    # is imported, so the first curvature computation pays no JIT warmup. The
+    # inputs are declared read-only so memory-mapped meshes are accepted too;
+    # writable arrays convert to that type
+    _ONE_RING_SIGNATURE = types.void(types.Array(types.float64, 2, 'C', readonly=True),
+                                     types.Array(types.int64, 1, 'C', readonly=True),
+                                     types.Array(types.int64, 1, 'C', readonly=True),
+                                     types.int64,
+                                     types.Array(types.float64, 1, 'C'))
+    
+    @njit(_ONE_RING_SIGNATURE, fastmath=True, cache=_CACHE)
+    def _one_ring_numba(V, indptr, indices, min_neighbors, out):
+        for i in range(indptr.shape[0] - 1):
+            start = indptr[i]
+            stop = indptr[i + 1]
+            if stop - start < min_neighbors:
+                continue
+            total = 0.0
+            for k in range(start, stop):
+                j = indices[k]
+                dx = V[j, 0] - V[i, 0]
+                dy = V[j, 1] - V[i, 1]
+                dz = V[j, 2] - V[i, 2]
+                total += np.sqrt(dx * dx + dy * dy + dz * dz)
+            out[i] = total / (stop - start)
+
+
+def one_ring_mean_distance(vertices, indptr, indices, min_neighbors=3):
+    """Mean distance from every vertex to its one-ring neighbors
+
+    The neighborhoods are given in CSR form (indptr, indices); vertices
+    with fewer than min_neighbors neighbors get 0.
+    """
+    V = np.ascontiguousarray(vertices, dtype=np.float64)
+    indptr = np.ascontiguousarray(indptr, dtype=np.int64)
+    indices = np.ascontiguousarray(indices, dtype=np.int64)
+    out = np.zeros(len(indptr) - 1, dtype=np.float64)
+
+    if HAVE_NUMBA:
+        _one_ring_numba(V, indptr, indices, min_neighbors, out)
+    else:
+        _one_ring_numpy(V, indptr, indices, min_neighbors, out)
+    return out
@@ -1,40 +1,315 @@
 # src/main_pipeline.py
+import os
+import re
+import tempfile
 import numpy as np
-from scipy.spatial import Delaunay
+from kernels import stretch_compensate, one_ring_mean_distance
+
+# Precision of loaded vertices and the 2D pattern; SVG output carries far
+# fewer digits than float32
+PATTERN_DTYPE = np.float32
+
+# Binary STL triangle record: normal, three vertices, attribute byte count
+STL_DTYPE = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attr', '<u2')])
+
+# Streaming loaders parse at most this many triangles / bytes per step
+STREAM_CHUNK_TRIANGLES = 1000000
+STREAM_CHUNK_BYTES = 16 * 1024 * 1024
+
+# OBJ vertex and face records, and the texture/normal part of a face token
+_OBJ_VERTEX = re.compile(rb'^v[ \t][^\n]*', re.M)
+_OBJ_FACE = re.compile(rb'^f[ \t][^\n]*', re.M)
+_OBJ_FACE_SUFFIX = re.compile(rb'/\S*')
+
+# Shape formats handed to trimesh; anything else is rejected before importing it
+MESH_FORMATS = frozenset({'stl', 'obj', 'ply', 'off'})
+
+# Triangles smaller than this fraction of the median triangle area are
+# degenerate and skipped in the exported SVG
+MIN_SVG_AREA_RATIO = 1e-6
+
+# One polygon's points attribute; %g on values pre-rounded to one decimal
+# matches _fmt
+SVG_POINTS_FMT = '%g,%g %g,%g %g,%g'
+
+# Demo surface arrays, built on first use and shared read-only afterwards
+_DEMO_SURFACE = None
+
+def _demo_surface():
+    """Build the saddle demo surface once per process"""
+    global _DEMO_SURFACE
+    if _DEMO_SURFACE is None:
+        # Create a saddle surface or dome
+        n = 15
+        x = np.linspace(-1, 1, n)
+        y = np.linspace(-1, 1, n)
+        X, Y = np.meshgrid(x, y)
+        
+        # Saddle surface: z = x^2 - y^2
+        Z = X**2 - Y**2
+        
+        vertices = np.column_stack([X.flatten(), Y.flatten(), Z.flatten()]).astype(PATTERN_DTYPE)
+        
+        # Split every grid cell into two counter-clockwise triangles
+        row, col = np.mgrid[:n - 1, :n - 1]
+        v1 = (row * n + col).ravel()
+        faces = np.empty((2 * len(v1), 3), dtype=np.int32)
+        faces[0::2] = np.column_stack([v1, v1 + 1, v1 + n])
+        faces[1::2] = np.column_stack([v1 + 1, v1 + n + 1, v1 + n])
+        
+        vertices.flags.writeable = False
+        faces.flags.writeable = False
+        _DEMO_SURFACE = {"vertices": vertices, "faces": faces}
+    return _DEMO_SURFACE
+
+def _triangle_areas(x, y):
+    """Shoelace area of every triangle from (F, 3) corner x and y arrays"""
+    return 0.5 * np.abs(x[:, 0] * (y[:, 1] - y[:, 2]) +
+                        x[:, 1] * (y[:, 2] - y[:, 0]) +
+                        x[:, 2] * (y[:, 0] - y[:, 1]))
+
+def _fmt(value):
+    """Format an SVG coordinate/length with one decimal and no trailing zeros"""
+    return f"{value:.1f}".rstrip('0').rstrip('.')
 
 class CurveUpToolchain:
     def __init__(self):
         self.input_mesh = None
         self.optimized_triangles = None
         self.stretch_factors = (1.0, 1.0)
+        self._curvature_map = None
+        self._pattern_buf = None
+        self._adaptive_mesh = None
+        self._svg_styles = None
+        self._svg_bytes = None
+        self._mmap_paths = []
         
     def load_mesh(self, filepath):
         """Load target 3D shape"""
         try:
-            # For now, use a curved demo surface
-            self.input_mesh = self._create_demo_surface()
+            ext = os.path.splitext(filepath)[1][1:].lower()
+            if ext:
+                if ext not in MESH_FORMATS:
+                    raise ValueError(f"unsupported format '.{ext}'")
+                # Name the format so trimesh skips sniffing, and skip its
+                # cleanup pass since only raw vertices and faces are used
+                import trimesh
+                mesh = trimesh.load_mesh(filepath, file_type=ext, process=False)
+                if len(getattr(mesh, 'faces', ())) == 0:
+                    raise ValueError("no triangles found")
+                if ext == 'stl':
+                    # STL stores a triangle soup; weld it so the curvature
+                    # pass sees shared vertices
+                    mesh.merge_vertices()
+                self.input_mesh = {"vertices": np.asarray(mesh.vertices, dtype=PATTERN_DTYPE),
+                                   "faces": np.asarray(mesh.faces)}
+            else:
+                # No file format given, use a curved demo surface
+                self.input_mesh = self._create_demo_surface()
+            self._curvature_map = None
             return f"✓ Loaded target shape: {len(self.input_mesh['vertices'])} vertices"
         except Exception as e:
             return f"✗ Error loading shape: {str(e)}"
     
-    def _create_demo_surface(self):
-        """Create a curved surface for demonstration (like paper examples)"""
-        # Create a saddle surface or dome
-        x = np.linspace(-1, 1, 15)
-        y = np.linspace(-1, 1, 15)
-        X, Y = np.meshgrid(x, y)
+    def load_mesh_streaming(self, filepath, progress_callback=None):
+        """Load a binary STL or OBJ shape in bounded-size chunks
         
-        # Saddle surface: z = x^2 - y^2
-        Z = X**2 - Y**2
+        Other formats fall back to load_mesh.
+        """
+        if progress_callback is None:
+            progress_callback = lambda percent: None
         
-        vertices = np.column_stack([X.flatten(), Y.flatten(), Z.flatten()])
+        try:
+            ext = os.path.splitext(filepath)[1].lower()
+            if ext == '.stl' and self._is_binary_stl(filepath):
+                mesh = self._stream_binary_stl(filepath, progress_callback)
+            elif ext == '.obj':
+                mesh = self._stream_obj(filepath, progress_callback)
+            else:
+                return self.load_mesh(filepath)
+            
+            if len(mesh['faces']) == 0:
+                raise ValueError("no triangles found")
+            # Check indices before replacing the current shape
+            if mesh['faces'].min() < 0 or mesh['faces'].max() >= len(mesh['vertices']):
+                raise ValueError("face refers to a missing vertex")
+            self.input_mesh = mesh
+            self._curvature_map = None
+            return f"✓ Loaded target shape: {len(self.input_mesh['vertices'])} vertices"
+        except Exception as e:
+            return f"✗ Error loading shape: {str(e)}"
+    
+    def _is_binary_stl(self, filepath):
+        """Binary STL files are exactly header + count + 50 bytes per triangle"""
+        with open(filepath, 'rb') as f:
+            header = f.read(84)
+        if len(header) < 84:
+            return False
+        n_triangles = int(np.frombuffer(header, dtype='<u4', count=1, offset=80)[0])
+        return os.path.getsize(filepath) == 84 + n_triangles * STL_DTYPE.itemsize
+    
+    def _stream_binary_stl(self, filepath, progress_callback):
+        """Read triangle records through a memory map, one slice at a time
+        
+        The slices drive progress reporting; welding needs every corner at
+        once, so peak memory still grows with the triangle count.
+        """
+        n_triangles = (os.path.getsize(filepath) - 84) // STL_DTYPE.itemsize
+        records = np.memmap(filepath, dtype=STL_DTYPE, mode='r', offset=84, shape=(n_triangles,))
+        
+        corners = np.empty((n_triangles * 3, 3), dtype=np.float32)
+        for start in range(0, n_triangles, STREAM_CHUNK_TRIANGLES):
+            stop = min(start + STREAM_CHUNK_TRIANGLES, n_triangles)
+            corners[start * 3:stop * 3] = records['vertices'][start:stop].reshape(-1, 3)
+            progress_callback(int(90 * stop / n_triangles))
+        del records
+        
+        # Weld the triangle soup into shared vertices
+        vertices, inverse = np.unique(corners, axis=0, return_inverse=True)
+        progress_callback(100)
+        return {"vertices": vertices, "faces": inverse.reshape(-1, 3)}
+    
+    def _stream_obj(self, filepath, progress_callback):
+        """Parse vertex and face records from fixed-size blocks of the file
         
-        # Create triangular mesh using Delaunay triangulation
-        tri = Delaunay(np.column_stack([X.flatten(), Y.flatten()]))
-        faces = tri.simplices
+        Each block is parsed with whole-block NumPy calls; blocks with
+        polygons, relative indices or extra vertex fields take the slower
+        line-by-line parser.
+        """
+        total_bytes = max(os.path.getsize(filepath), 1)
+        vertex_blocks = []
+        face_blocks = []
+        n_vertices = 0
+        bytes_read = 0
+        remainder = b''
         
+        with open(filepath, 'rb') as f:
+            while True:
+                block = f.read(STREAM_CHUNK_BYTES)
+                bytes_read += len(block)
+                data = remainder + block
+                if block:
+                    # Carry the trailing partial line over to the next block
+                    cut = data.rfind(b'\n') + 1
+                    data, remainder = data[:cut], data[cut:]
+                
+                parsed = self._parse_obj_block(data, n_vertices)
+                if parsed is None:
+                    parsed = self._parse_obj_lines(data, n_vertices)
+                coords, faces = parsed
+                if len(coords):
+                    vertex_blocks.append(coords)
+                    n_vertices += len(coords)
+                if len(faces):
+                    face_blocks.append(faces)
+                
+                progress_callback(int(100 * bytes_read / total_bytes))
+                if not block:
+                    break
+        
+        vertices = np.concatenate(vertex_blocks) if vertex_blocks else np.zeros((0, 3), dtype=PATTERN_DTYPE)
+        faces = np.concatenate(face_blocks) if face_blocks else np.zeros((0, 3), dtype=np.int64)
         return {"vertices": vertices, "faces": faces}
     
+    def _parse_obj_block(self, data, n_vertices):
+        """Parse a block of x y z vertices and triangles with absolute indices
+        
+        Returns (vertices, faces), or None when the block needs the
+        line-by-line parser.
+        """
+        vertex_lines = _OBJ_VERTEX.findall(data)
+        face_lines = _OBJ_FACE.findall(data)
+        try:
+            coords = np.fromstring(b' '.join(vertex_lines).replace(b'v', b' '),
+                                   dtype=np.float64, sep=' ')
+            # Keep only the vertex index of each v/vt/vn token
+            face_text = b' '.join(face_lines).replace(b'f', b' ')
+            if b'/' in face_text:
+                face_text = _OBJ_FACE_SUFFIX.sub(b'', face_text)
+            idx = np.fromstring(face_text, dtype=np.int64, sep=' ')
+        except ValueError:
+            return None
+        if len(coords) != 3 * len(vertex_lines) or len(idx) != 3 * len(face_lines):
+            return None
+        if (idx <= 0).any():
+            # Relative indices depend on each face's position in the file
+            return None
+        return coords.astype(PATTERN_DTYPE).reshape(-1, 3), (idx - 1).reshape(-1, 3)
+    
+    def _parse_obj_lines(self, data, n_vertices):
+        """Parse a block line by line, fan-triangulating polygons"""
+        coords = []
+        faces = []
+        for line in data.split(b'\n'):
+            if line.startswith(b'v '):
+                coords.append(line.split()[1:4])
+            elif line.startswith(b'f '):
+                # Relative indices count back from the vertices read so far
+                seen = n_vertices + len(coords)
+                # Keep only the vertex index of each v/vt/vn token
+                idx = [int(token.split(b'/')[0]) for token in line.split()[1:]]
+                if 0 in idx:
+                    raise ValueError("OBJ face indices start at 1")
+                idx = [i - 1 if i > 0 else seen + i for i in idx]
+                # Fan-triangulate polygons
+                for k in range(1, len(idx) - 1):
+                    faces.append((idx[0], idx[k], idx[k + 1]))
+        return (np.array(coords, dtype=PATTERN_DTYPE).reshape(-1, 3),
+                np.array(faces, dtype=np.int64).reshape(-1, 3))
+    
+    def precompute(self):
+        """Compute the stretch-independent mesh data used by the pipeline"""
+        if self.input_mesh is None:
+            return
+        self._curvature_map = self._compute_surface_curvature()
+    
+    def attach_cache(self, data):
+        """Reuse mesh data previously written by save_cache"""
+        curvature = np.asarray(data['curvature'], dtype=PATTERN_DTYPE)
+        if len(curvature) != len(self.input_mesh['vertices']):
+            raise ValueError("Cached data does not match the loaded shape")
+        self._curvature_map = curvature
+    
+    def save_cache(self, filepath):
+        """Write the precomputed mesh data to an .npz file"""
+        np.savez(filepath, curvature=self._curvature_map)
+    
+    def mmap_arrays(self, directory):
+        """Move the mesh buffers into read-only memory-mapped files
+        
+        The pipeline only takes views of these arrays, so large meshes are
+        paged in from disk instead of being duplicated in RAM. Files from the
+        previous call are removed once the new arrays are in place.
+        """
+        mapped = {}
+        paths = []
+        for name, dtype in (('vertices', np.float32), ('faces', np.int32)):
+            array = np.ascontiguousarray(self.input_mesh[name], dtype=dtype)
+            if array.size == 0:
+                # Empty files cannot be mapped
+                mapped[name] = array
+                continue
+            fd, path = tempfile.mkstemp(suffix=f'_{name}.bin', dir=directory)
+            os.close(fd)
+            array.tofile(path)
+            paths.append(path)
+            mapped[name] = np.memmap(path, dtype=dtype, mode='r', shape=array.shape)
+        
+        # Swap both arrays at once so no reader sees vertices and faces from different loads
+        self.input_mesh = {**self.input_mesh, **mapped}
+        old_paths, self._mmap_paths = self._mmap_paths, paths
+        for path in old_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                # Still mapped on Windows; the temporary directory is removed at exit
+                pass
+    
+    def _create_demo_surface(self):
+        """Create a curved surface for demonstration (like paper examples)"""
+        # New dict so mmap_arrays can swap entries without touching the shared arrays
+        return dict(_demo_surface())
+    
     def compute_optimal_triangles(self, stretch_x=1.5, stretch_y=1.5, triangle_density=0.1):
         """Compute adaptive triangular mesh for 3D printing on stretched fabric"""
         if self.input_mesh is None:
@@ -45,130 +320,131 @@ class CurveUpToolchain:
             
             # Core CurveUp algorithm:
             # 1. Compute surface curvature to determine triangle sizes
-            curvature_map = self._compute_surface_curvature()
+            #    (independent of stretch, so reused until a new shape is loaded)
+            if self._curvature_map is None:
+                self._curvature_map = self._compute_surface_curvature()
+            curvature_map = self._curvature_map
             
-            # 2. Generate adaptive triangular mesh
-            adaptive_mesh = self._generate_adaptive_mesh(curvature_map, triangle_density)
+            # 2. Generate adaptive triangular mesh (also stretch independent,
+            #    so reused while the curvature map and density stay the same)
+            if (self._adaptive_mesh is None or self._adaptive_mesh[0] is not curvature_map
+                    or self._adaptive_mesh[1] != triangle_density):
+                self._adaptive_mesh = (curvature_map, triangle_density,
+                                       self._generate_adaptive_mesh(curvature_map, triangle_density))
+            adaptive_mesh = self._adaptive_mesh[2]
             
             # 3. Optimize triangle distribution for fabric mechanics
             self.optimized_triangles = self._optimize_triangle_placement(
                 adaptive_mesh, curvature_map, stretch_x, stretch_y
             )
             
-            return f"✓ Computed {len(self.optimized_triangles)} adaptive triangles"
+            return f"✓ Computed {self.triangle_count()} adaptive triangles"
             
         except Exception as e:
             return f"✗ Triangle computation error: {str(e)}"
     
     def _compute_surface_curvature(self):
         """Compute mean curvature to guide triangle sizing"""
-        vertices = self.input_mesh['vertices']
-        faces = self.input_mesh['faces']
-        curvature = np.zeros(len(vertices))
-        
-        # Simplified curvature computation using Laplacian
-        for i, vertex in enumerate(vertices):
-            # Find adjacent vertices (one-ring neighborhood)
-            neighbors = []
-            for face in faces:
-                if i in face:
-                    neighbors.extend([v for v in face if v != i])
-            neighbors = list(set(neighbors))
-            
-            if len(neighbors) > 2:
-                # Simple discrete mean curvature approximation
-                neighbor_vectors = vertices[neighbors] - vertex
-                curvature[i] = np.mean(np.linalg.norm(neighbor_vectors, axis=1))
+        from scipy.sparse import coo_matrix
+        
+        vertices = np.asarray(self.input_mesh['vertices'])
+        faces = np.asarray(self.input_mesh['faces'])
+        n_vertices = len(vertices)
+        
+        # One-ring neighborhoods as a sparse vertex adjacency matrix: every
+        # ordered pair of distinct corners of a face, duplicates merged
+        rows = faces[:, [0, 0, 1, 1, 2, 2]].ravel()
+        cols = faces[:, [1, 2, 0, 2, 0, 1]].ravel()
+        distinct = rows != cols
+        adjacency = coo_matrix((np.ones(np.count_nonzero(distinct), dtype=np.int8),
+                                (rows[distinct], cols[distinct])),
+                               shape=(n_vertices, n_vertices)).tocsr()
+        
+        # Simple discrete mean curvature approximation: mean distance to the
+        # one-ring, for vertices with more than two neighbors
+        curvature = one_ring_mean_distance(vertices, adjacency.indptr, adjacency.indices,
+                                           min_neighbors=3)
         
         # Normalize curvature
-        if np.max(curvature) > 0:
-            curvature = curvature / np.max(curvature)
+        peak = curvature.max()
+        if peak > 0:
+            curvature /= peak
         
-        return curvature
+        return curvature.astype(PATTERN_DTYPE)
     
     def _generate_adaptive_mesh(self, curvature_map, density):
-    """Robust adaptive mesh generation using original mesh structure"""
-    vertices = self.input_mesh['vertices']
-    faces = self.input_mesh['faces']
+        """Robust adaptive mesh generation using original mesh structure"""
+        vertices = self.input_mesh['vertices']
+        faces = np.asarray(self.input_mesh['faces'])
     
-    # For simplicity, use the original mesh but with adaptive properties
-    # In a full implementation, this would do actual mesh refinement
+        # For simplicity, use the original mesh but with adaptive properties
+        # In a full implementation, this would do actual mesh refinement
     
-    triangle_sizes = []
-    for face in faces:
-        if len(face) == 3:
-            # Calculate average curvature for this triangle
-            curvatures = []
-            for vertex_idx in face:
-                if vertex_idx < len(curvature_map):
-                    curvatures.append(curvature_map[vertex_idx])
-            
-            if curvatures:
-                avg_curvature = np.mean(curvatures)
-                # Smaller triangles in high curvature areas
-                base_size = 0.2
-                adaptive_size = base_size * (1.0 - 0.5 * avg_curvature)  # 0.1 to 0.2 range
-            else:
-                adaptive_size = 0.15
-            
-            triangle_sizes.append(adaptive_size)
-        else:
-            triangle_sizes.append(0.15)
-    
-    return {
-        'vertices_2d': vertices[:, :2],
-        'vertices_3d': vertices,
-        'faces': faces,
-        'triangle_sizes': triangle_sizes,
-        'original_vertex_map': list(range(len(vertices)))
-    }
+        # Average curvature of each triangle over the corners that have a value
+        curvature_map = np.asarray(curvature_map)
+        known = faces < len(curvature_map)
+        corner_curvature = np.where(known, curvature_map[np.where(known, faces, 0)], 0.0)
+        counts = known.sum(axis=1)
+        avg_curvature = corner_curvature.sum(axis=1) / np.maximum(counts, 1)
+        
+        # Smaller triangles in high curvature areas
+        base_size = 0.2
+        triangle_sizes = np.where(counts > 0,
+                                  base_size * (1.0 - 0.5 * avg_curvature),  # 0.1 to 0.2 range
+                                  0.15)
     
-    def _optimize_triangle_placement(self, adaptive_mesh, curvature_map, stretch_x, stretch_y):
-        """Optimize triangle distribution considering fabric stretch mechanics"""
-        optimized_triangles = []
-        
-        # Apply fabric stretch compensation
-        vertices_2d = adaptive_mesh['vertices_2d'].copy()
-        vertices_2d[:, 0] /= stretch_x  # Compress X for later stretching
-        vertices_2d[:, 1] /= stretch_y  # Compress Y for later stretching
-        
-        for face in adaptive_mesh['faces']:
-            if len(face) == 3:  # Only process triangles
-                # Get triangle vertices
-                v1, v2, v3 = face
-                
-                # Calculate triangle properties
-                points_2d = vertices_2d[face]
-                points_3d = adaptive_mesh['vertices_3d'][face]
-                
-                # Triangle area in 2D (printing plane)
-                area_2d = self._triangle_area(points_2d)
-                
-                # Estimate required rigidity based on curvature
-                avg_curvature = np.mean([curvature_map[v] for v in face])
-                rigidity_factor = 0.5 + avg_curvature  # 0.5 to 1.5 range
-                
-                optimized_triangles.append({
-                    'vertices_2d': points_2d,
-                    'vertices_3d': points_3d,
-                    'area': area_2d,
-                    'rigidity': rigidity_factor,
-                    'thickness': 0.1 + 0.1 * avg_curvature,  # Thicker in high-curvature areas
-                    'material_density': 0.3 + 0.4 * avg_curvature  # Denser printing
-                })
-        
-        return optimized_triangles
+        return {
+            # Planar coordinates as separate contiguous arrays (SoA)
+            'x': np.ascontiguousarray(vertices[:, 0]),
+            'y': np.ascontiguousarray(vertices[:, 1]),
+            'vertices_3d': vertices,
+            'faces': faces,
+            'triangle_sizes': triangle_sizes,
+            'original_vertex_map': np.arange(len(vertices))
+        }
     
-    def _triangle_area(self, points):
-        """Calculate area of a triangle given 3 points"""
-        if len(points) != 3:
+    def triangle_count(self):
+        """Number of triangles in the current result (0 if none computed)"""
+        if self.optimized_triangles is None:
             return 0
-        a, b, c = points
-        return 0.5 * abs(
-            a[0]*(b[1]-c[1]) + 
-            b[0]*(c[1]-a[1]) + 
-            c[0]*(a[1]-b[1])
-        )
+        return len(self.optimized_triangles['area'])
+    
+    def _optimize_triangle_placement(self, adaptive_mesh, curvature_map, stretch_x, stretch_y):
+        """Optimize triangle distribution considering fabric stretch mechanics
+        
+        Returns a dict of per-triangle arrays (structure of arrays) indexed
+        by triangle: 'vertices_2d' (F, 3, 2), 'vertices_3d' (F, 3, 3) and
+        'area', 'rigidity', 'thickness', 'material_density' of shape (F,).
+        """
+        # Apply fabric stretch compensation (compress now, stretch later)
+        # straight into the columns of a buffer reused while the vertex
+        # count stays the same
+        x = adaptive_mesh['x']
+        y = adaptive_mesh['y']
+        if self._pattern_buf is None or len(self._pattern_buf) != len(x):
+            self._pattern_buf = np.empty((len(x), 2), dtype=PATTERN_DTYPE)
+        vertices_2d = self._pattern_buf
+        stretch_compensate(x, y, stretch_x, stretch_y, vertices_2d[:, 0], vertices_2d[:, 1])
+        
+        # Gather the corners of every triangle (copies, so the buffer can be reused)
+        faces = adaptive_mesh['faces']
+        points_2d = vertices_2d[faces]
+        points_3d = adaptive_mesh['vertices_3d'][faces]
+        
+        # Triangle area in 2D (printing plane)
+        area_2d = _triangle_areas(points_2d[..., 0], points_2d[..., 1])
+        
+        # Estimate required rigidity based on curvature
+        avg_curvature = np.asarray(curvature_map)[faces].mean(axis=1)
+        
+        return {
+            'vertices_2d': points_2d,
+            'vertices_3d': points_3d,
+            'area': area_2d,
+            'rigidity': 0.5 + avg_curvature,  # 0.5 to 1.5 range
+            'thickness': 0.1 + 0.1 * avg_curvature,  # Thicker in high-curvature areas
+            'material_density': 0.3 + 0.4 * avg_curvature  # Denser printing
+        }
     
     def export_print_pattern(self, filepath):
         """Export adaptive triangular mesh for 3D printing on stretched fabric"""
@@ -186,93 +462,126 @@ class CurveUpToolchain:
     
     def _export_triangles_svg(self, filepath):
         """Export adaptive triangles as SVG for 3D printing"""
-        if not self.optimized_triangles:
+        if self.triangle_count() == 0:
             return "✗ No triangles to export"
         
+        # Re-exporting the same result (e.g. to another file) reuses the encoded document
+        key = (self.optimized_triangles, self.stretch_factors)
+        if (self._svg_bytes is None or self._svg_bytes[0][0] is not key[0]
+                or self._svg_bytes[0][1] != key[1]):
+            self._svg_bytes = (key, self._render_svg())
+        
+        # Write the bytes in a single call, without text-mode newline translation
+        with open(filepath, 'wb') as f:
+            f.write(self._svg_bytes[1])
+        
+        return f"✓ Adaptive triangle pattern exported to {filepath}"
+    
+    def _render_svg(self):
+        """Build the SVG document for the current triangles as UTF-8 bytes"""
         # Scale for visualization
         scale = 800
         margin = 50
         
-        # Get all 2D points and normalize
-        all_points = []
-        for triangle in self.optimized_triangles:
-            all_points.extend(triangle['vertices_2d'])
+        # Gather all 2D corners as rows of x0, y0, x1, y1, x2, y2
+        corners = self.optimized_triangles['vertices_2d'].reshape(-1, 6)
         
-        all_points = np.array(all_points)
-        min_vals = np.min(all_points, axis=0)
-        max_vals = np.max(all_points, axis=0)
-        range_vals = max_vals - min_vals
-        range_vals[range_vals == 0] = 1
+        xy = corners.reshape(-1, 2)
+        min_vals = xy.min(axis=0).astype(np.float64)
+        extent = np.ptp(xy, axis=0).astype(np.float64)
+        range_vals = np.where(extent == 0, 1.0, extent)
         
         # Normalize and scale
-        normalized_points = (all_points - min_vals) / range_vals
-        max_normalized = np.max(normalized_points, axis=0)
+        max_normalized = extent / range_vals
         
         width = max_normalized[0] * scale + 2 * margin
         height = max_normalized[1] * scale + 2 * margin
         
-        svg_content = f'''<?xml version="1.0" encoding="UTF-8"?>
-<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">
+        # Normalize, scale and offset as one multiply-add per coordinate
+        gain = scale / range_vals
+        offset = margin - min_vals * gain
+        points = corners * np.tile(gain, 3)
+        points += np.tile(offset, 3)
+        
+        # Skip only degenerate triangles; the threshold follows the mesh
+        # density so small but real triangles are still printed
+        area = _triangle_areas(points[:, 0::2], points[:, 1::2])
+        kept = np.flatnonzero(area > MIN_SVG_AREA_RATIO * np.median(area))
+        skipped = len(area) - len(kept)
+        skipped_note = f" ({skipped} degenerate skipped)" if skipped else ""
+        
+        points = points[kept]
+        np.round(points, 1, out=points)
+        
+        # Collect fragments and join once; += would recopy the whole document per triangle
+        parts = [f'''<?xml version="1.0" encoding="UTF-8"?>
+<svg width="{_fmt(width)}" height="{_fmt(height)}" xmlns="http://www.w3.org/2000/svg">
   <title>CurveUp - Adaptive Triangular Mesh for 3D Printing</title>
   <rect width="100%" height="100%" fill="white"/>
   
-  <text x="{width/2}" y="30" text-anchor="middle" font-family="Arial" font-size="16" font-weight="bold">
+  <text x="{_fmt(width/2)}" y="30" text-anchor="middle" font-family="Arial" font-size="16" font-weight="bold">
     CurveUp Adaptive Triangular Mesh
   </text>
-  <text x="{width/2}" y="55" text-anchor="middle" font-family="Arial" font-size="12">
-    Stretch Factors: {self.stretch_factors[0]:.1f}x{self.stretch_factors[1]:.1f} | Triangles: {len(self.optimized_triangles)}
+  <text x="{_fmt(width/2)}" y="55" text-anchor="middle" font-family="Arial" font-size="12">
+    Stretch Factors: {self.stretch_factors[0]:.1f}x{self.stretch_factors[1]:.1f} | Triangles: {len(kept)}{skipped_note}
   </text>
-'''
+''']
         
-        # Draw each adaptive triangle
-        for i, triangle in enumerate(self.optimized_triangles):
-            points_2d = triangle['vertices_2d']
-            
-            # Normalize and scale points
-            scaled_points = []
-            for point in points_2d:
-                normalized = (point - min_vals) / range_vals
-                x = normalized[0] * scale + margin
-                y = normalized[1] * scale + margin
-                scaled_points.append((x, y))
-            
-            # Create polygon points string
-            points_str = " ".join([f"{x:.1f},{y:.1f}" for x, y in scaled_points])
-            
-            # Determine fill color based on rigidity (darker = more rigid)
-            rigidity = triangle['rigidity']
-            intensity = int(100 + 100 * rigidity)  # 100-200 range
-            fill_color = f"rgb({intensity}, {intensity}, 255)"  # Blue shades
-            
-            # Determine stroke width based on thickness
-            stroke_width = 1 + triangle['thickness'] * 3
-            
-            svg_content += f'''
-  <!-- Triangle {i} - Rigidity: {rigidity:.2f} -->
-  <polygon points="{points_str}" 
-           fill="{fill_color}" 
-           stroke="navy" 
-           stroke-width="{stroke_width}" 
-           opacity="0.8"/>'''
+        # Draw each adaptive triangle; the shared stroke colour is set once on the group
+        parts.append('''
+  <g stroke="navy">''')
+        # One pass over plain lists: cached markup around each triangle's
+        # points, formatted with a single template
+        styles = self._svg_triangle_styles()
+        points_fmt = SVG_POINTS_FMT
+        parts.extend([styles[i][0] + points_fmt % tuple(row) + styles[i][1]
+                      for i, row in zip(kept.tolist(), points.tolist())])
+        parts.append('''
+  </g>''')
         
         # Add legend
         legend_y = height - 80
-        svg_content += f'''
+        parts.append(f'''
   <!-- Legend -->
-  <rect x="20" y="{legend_y}" width="150" height="60" fill="white" stroke="gray" stroke-width="1"/>
-  <text x="30" y="{legend_y + 20}" font-family="Arial" font-size="11" font-weight="bold">Legend:</text>
-  <text x="30" y="{legend_y + 35}" font-family="Arial" font-size="10">• Darker blue = More rigid</text>
-  <text x="30" y="{legend_y + 50}" font-family="Arial" font-size="10">• Thicker border = Thicker print</text>
+  <rect x="20" y="{_fmt(legend_y)}" width="150" height="60" fill="white" stroke="gray" stroke-width="1"/>
+  <text x="30" y="{_fmt(legend_y + 20)}" font-family="Arial" font-size="11" font-weight="bold">Legend:</text>
+  <text x="30" y="{_fmt(legend_y + 35)}" font-family="Arial" font-size="10">• Darker blue = More rigid</text>
+  <text x="30" y="{_fmt(legend_y + 50)}" font-family="Arial" font-size="10">• Thicker border = Thicker print</text>
   
-  <text x="20" y="{height-10}" font-family="Arial" font-size="10">
+  <text x="20" y="{_fmt(height - 10)}" font-family="Arial" font-size="10">
     Print this pattern on fabric stretched {self.stretch_factors[0]:.1f}x{self.stretch_factors[1]:.1f}
   </text>
-</svg>'''
+</svg>''')
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(svg_content)
+        return "".join(parts).encode('utf-8')
+    
+    def _svg_triangle_styles(self):
+        """SVG markup around each triangle's points, reused across exports
         
-        return f"✓ Adaptive triangle pattern exported to {filepath}"
+        Rigidity and thickness only depend on curvature, so the markup stays
+        valid for every stretch setting until a new shape is loaded.
+        """
+        if (self._svg_styles is None or self._svg_styles[0] is not self._curvature_map
+                or len(self._svg_styles[1]) != self.triangle_count()):
+            styles = []
+            triangles = self.optimized_triangles
+            for i, (rigidity, thickness) in enumerate(zip(triangles['rigidity'].tolist(),
+                                                          triangles['thickness'].tolist())):
+                # Determine fill color based on rigidity (darker = more rigid)
+                intensity = int(100 + 100 * rigidity)  # 100-200 range
+                fill_color = f"rgb({intensity}, {intensity}, 255)"  # Blue shades
+                
+                # Determine stroke width based on thickness
+                stroke_width = 1 + thickness * 3
+                
+                styles.append((f'''
+  <!-- Triangle {i} - Rigidity: {rigidity:.2f} -->
+  <polygon points="''', f'''" 
+           fill="{fill_color}" 
+           stroke-width="{_fmt(stroke_width)}" 
+           opacity="0.8"/>'''))
+            self._svg_styles = (self._curvature_map, styles)
+        return self._svg_styles[1]
     
     def _export_triangles_gcode(self, filepath):
         """Export triangles as G-code for 3D printers"""
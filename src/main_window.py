@@ -0,0 +1,385 @@
+# src/main_window.py
+import os
+import hashlib
+import tempfile
+from collections import OrderedDict
+from PyQt5.QtWidgets import (QMainWindow, QVBoxLayout, QHBoxLayout, 
+                             QPushButton, QLabel, QFileDialog, QComboBox, 
+                             QDoubleSpinBox, QGroupBox, QPlainTextEdit, QProgressBar,
+                             QWidget, QMessageBox)
+from PyQt5.QtCore import Qt, QThreadPool, QTimer
+from worker import Worker
+from _lazy import cached_import, LazyObject
+
+MESH_METHODS = ("Adaptive Curvature", "Uniform Density")
+OPEN_FILTER = "3D Files (*.obj *.stl *.ply);;All Files (*.*)"
+SVG_FILTER = "SVG Files (*.svg)"
+SAVE_FILTER = SVG_FILTER + ";;All Files (*.*)"
+
+# Number of computed triangle sets kept for instant re-display
+RESULT_CACHE_SIZE = 8
+
+# Oldest log lines are dropped beyond this count
+LOG_MAX_LINES = 500
+
+# Quiet period after the last stretch change before triangles are recomputed
+APPLY_DELAY_MS = 250
+
+# Set by gui_main when the background import of the pipeline fails
+PRELOAD_ERROR = None
+
+# Parsed once by QApplication and matched to widgets by object name
+APP_STYLESHEET = """
+QLabel#header { font-size: 18px; font-weight: bold; padding: 10px; color: #2c3e50; }
+QPushButton#load { padding: 8px; font-weight: bold; }
+QPushButton#generate { background-color: #3498db; color: white; padding: 10px; font-weight: bold; }
+QPushButton#export { background-color: #27ae60; color: white; padding: 10px; font-weight: bold; }
+"""
+
+class MainWindow(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.toolchain = None
+        self.threadpool = QThreadPool()
+        self._pending_log = []
+        # One worker at a time: load, compute and export share the toolchain
+        self._busy = False
+        self._can_export = False
+        # Checked on the GUI thread instead of touching the lazy toolchain
+        self._mesh_loaded = False
+        self.init_ui()
+        # Set up the toolchain after the window has painted
+        QTimer.singleShot(0, self.init_toolchain)
+        
+    def init_ui(self):
+        self.setWindowTitle("CurveUp - 3D Printing Pattern Generator for Stretched Fabric")
+        self.setGeometry(100, 100, 600, 500)
+        
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        
+        layout = QVBoxLayout()
+        
+        # Header
+        header = QLabel("CurveUp - Adaptive Triangular Meshes for Stretched Fabric")
+        header.setObjectName("header")
+        header.setAlignment(Qt.AlignCenter)
+        layout.addWidget(header)
+        
+        # File operations
+        file_group = QGroupBox("1. Load Target 3D Shape")
+        file_layout = QVBoxLayout()
+        
+        self.btn_load = QPushButton("Load 3D Shape (OBJ/STL)")
+        self.btn_load.clicked.connect(self.load_model)
+        self.btn_load.setObjectName("load")
+        file_layout.addWidget(self.btn_load)
+        
+        self.file_label = QLabel("No shape loaded")
+        file_layout.addWidget(self.file_label)
+        
+        file_group.setLayout(file_layout)
+        layout.addWidget(file_group)
+        
+        # Mesh settings
+        mesh_group = QGroupBox("2. Mesh Settings")
+        mesh_layout = QVBoxLayout()
+        
+        self.cmb_method = QComboBox()
+        self.cmb_method.addItems(MESH_METHODS)
+        mesh_layout.addWidget(QLabel("Mesh Generation:"))
+        mesh_layout.addWidget(self.cmb_method)
+        
+        mesh_group.setLayout(mesh_layout)
+        layout.addWidget(mesh_group)
+        
+        # Fabric properties
+        fabric_group = QGroupBox("3. Fabric Stretch Properties")
+        fabric_layout = QHBoxLayout()
+        
+        self.spin_stretch_x = QDoubleSpinBox()
+        self.spin_stretch_x.setRange(1.0, 3.0)
+        self.spin_stretch_x.setValue(1.5)
+        self.spin_stretch_x.setSingleStep(0.1)
+        fabric_layout.addWidget(QLabel("X Stretch:"))
+        fabric_layout.addWidget(self.spin_stretch_x)
+        
+        self.spin_stretch_y = QDoubleSpinBox()
+        self.spin_stretch_y.setRange(1.0, 3.0)
+        self.spin_stretch_y.setValue(1.5)
+        self.spin_stretch_y.setSingleStep(0.1)
+        fabric_layout.addWidget(QLabel("Y Stretch:"))
+        fabric_layout.addWidget(self.spin_stretch_y)
+        
+        fabric_group.setLayout(fabric_layout)
+        layout.addWidget(fabric_group)
+        
+        # Recompute once the user stops adjusting; each change restarts the countdown
+        self._apply_timer = QTimer(self)
+        self._apply_timer.setSingleShot(True)
+        self._apply_timer.setInterval(APPLY_DELAY_MS)
+        self._apply_timer.timeout.connect(self._apply_stretch)
+        self.spin_stretch_x.valueChanged.connect(lambda _: self._apply_timer.start())
+        self.spin_stretch_y.valueChanged.connect(lambda _: self._apply_timer.start())
+        
+        # Process buttons
+        button_layout = QHBoxLayout()
+        
+        self.btn_generate = QPushButton("Compute Adaptive Triangles")
+        self.btn_generate.clicked.connect(self.generate_pattern)
+        self.btn_generate.setObjectName("generate")
+        button_layout.addWidget(self.btn_generate)
+        
+        self.btn_export = QPushButton("Export Triangle Mesh")
+        self.btn_export.clicked.connect(self.export_pattern)
+        self.btn_export.setObjectName("export")
+        self.btn_export.setEnabled(False)
+        button_layout.addWidget(self.btn_export)
+        
+        layout.addLayout(button_layout)
+        
+        # Progress bar
+        self.progress = QProgressBar()
+        self.progress.setVisible(False)
+        layout.addWidget(self.progress)
+        
+        # Log output
+        self.text_log = QPlainTextEdit()
+        self.text_log.setMaximumBlockCount(LOG_MAX_LINES)
+        self.text_log.setMaximumHeight(150)
+        self.text_log.setPlaceholderText("Operation log will appear here...")
+        layout.addWidget(QLabel("Operation Log:"))
+        layout.addWidget(self.text_log)
+        
+        central_widget.setLayout(layout)
+        
+    def init_toolchain(self):
+        if self.toolchain is not None:
+            return
+        try:
+            # The pipeline module is imported on the toolchain's first use
+            self.toolchain = LazyObject(lambda: cached_import("main_pipeline", "CurveUpToolchain")())
+            self._mesh_key = None
+            self._result_cache = OrderedDict()
+            self._mmap_dir = tempfile.TemporaryDirectory(prefix='curveup_', ignore_cleanup_errors=True)
+        except Exception as e:
+            self.log_message(f"✗ Error initializing toolchain: {e}")
+            return
+        
+        # Import the pipeline (and compile its kernels) off the GUI thread and
+        # report the outcome once it is known
+        worker = Worker(self._run_init)
+        worker.signals.finished.connect(self.log_message)
+        worker.signals.error.connect(self._on_init_error)
+        self.threadpool.start(worker)
+        
+    def _run_init(self, progress_callback):
+        global PRELOAD_ERROR
+        # Report a failed background import once; later calls import again
+        error, PRELOAD_ERROR = PRELOAD_ERROR, None
+        if error is not None:
+            raise error
+        cached_import("main_pipeline", "CurveUpToolchain")
+        return "✓ Toolchain initialized successfully"
+        
+    def _on_init_error(self, error):
+        self.log_message(f"✗ Error initializing toolchain: {error}")
+        # Try again on the next load or compute
+        self.toolchain = None
+            
+    def load_model(self):
+        if self.toolchain is None:
+            self.init_toolchain()
+        filepath, _ = QFileDialog.getOpenFileName(
+            self, "Open 3D Shape", "", OPEN_FILTER
+        )
+        if filepath and self.toolchain:
+            self._set_busy(True)
+            self.progress.setVisible(True)
+            self.progress.setValue(0)
+            worker = Worker(self._run_load, filepath)
+            worker.signals.progress.connect(self.progress.setValue)
+            worker.signals.finished.connect(lambda outcome: self._on_load_done(filepath, *outcome))
+            worker.signals.error.connect(self._on_load_error)
+            self.threadpool.start(worker)
+            
+    def _run_load(self, filepath, progress_callback):
+        """Load the shape and return (status, mesh key); runs on a worker thread"""
+        # Key cached results on the file contents rather than the mesh arrays
+        sha1 = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(block)
+        result = self.toolchain.load_mesh_streaming(filepath, progress_callback)
+        if "✓" in result:
+            self.toolchain.mmap_arrays(self._mmap_dir.name)
+            self._load_sidecar(filepath)
+        return result, sha1.hexdigest()
+        
+    def _load_sidecar(self, filepath):
+        """Reuse or create the precomputed mesh data stored beside the shape"""
+        import numpy as np
+        
+        sidecar = filepath + '.curveup.npz'
+        if os.path.exists(sidecar) and os.path.getmtime(sidecar) > os.path.getmtime(filepath):
+            try:
+                with np.load(sidecar) as data:
+                    self.toolchain.attach_cache(data)
+                return
+            except (OSError, KeyError, ValueError):
+                pass
+        
+        self.toolchain.precompute()
+        try:
+            self.toolchain.save_cache(sidecar)
+        except OSError:
+            # Read-only location; the data is still cached for this session
+            pass
+        
+    def _on_load_done(self, filepath, result, mesh_key):
+        # A failed load leaves the previous mesh, and its key, in place
+        if "✓" in result:
+            self._mesh_key = mesh_key
+            self._mesh_loaded = True
+            self.file_label.setText(f"Loaded: {os.path.basename(filepath)}")
+        self.log_message(f"✓ {result}")
+        self.progress.setVisible(False)
+        self._set_busy(False)
+        
+    def _on_load_error(self, error):
+        self.log_message(f"✗ Error loading shape: {error}")
+        # The toolchain may already hold the new mesh without its cache data;
+        # forget the previous shape so nothing is cached under its key
+        self._mesh_key = None
+        self._mesh_loaded = False
+        self._can_export = False
+        self.file_label.setText("No shape loaded")
+        self.progress.setVisible(False)
+        self._set_busy(False)
+                
+    def generate_pattern(self):
+        if self.toolchain is None:
+            self.init_toolchain()
+        if not self.toolchain:
+            self.log_message("✗ Toolchain not initialized")
+            return
+            
+        stretch_x = self.spin_stretch_x.value()
+        stretch_y = self.spin_stretch_y.value()
+        method = self.cmb_method.currentText()
+        key = (self._mesh_key, method, round(stretch_x, 3), round(stretch_y, 3))
+        
+        # Reuse a previous result if nothing has changed
+        if self._mesh_key is not None and key in self._result_cache:
+            self._result_cache.move_to_end(key)
+            self.toolchain.optimized_triangles = self._result_cache[key]
+            self.toolchain.stretch_factors = (stretch_x, stretch_y)
+            self.log_message(f"✓ Reused {self.toolchain.triangle_count()} cached adaptive triangles")
+            self._can_export = True
+            self.btn_export.setEnabled(True)
+            return
+        
+        self._set_busy(True)
+        self.progress.setVisible(True)
+        self.progress.setValue(0)
+        self.log_message("🔄 Computing adaptive triangles...")
+        
+        # Run the pipeline on the thread pool so the UI stays responsive
+        worker = Worker(self._run_pipeline, stretch_x, stretch_y)
+        worker.signals.progress.connect(self.progress.setValue)
+        worker.signals.finished.connect(lambda result: self._on_pattern_done(key, result))
+        worker.signals.error.connect(self._on_pattern_error)
+        self.threadpool.start(worker)
+        
+    def _apply_stretch(self):
+        if not self._mesh_loaded:
+            return
+        if self._busy:
+            # A load, computation or export is still running; try again after it finishes
+            self._apply_timer.start()
+            return
+        self.generate_pattern()
+        
+    def _run_pipeline(self, stretch_x, stretch_y, progress_callback):
+        """Compute optimal triangles for 3D printing (runs on a worker thread)"""
+        progress_callback(50)
+        result = self.toolchain.compute_optimal_triangles(stretch_x, stretch_y)
+        progress_callback(100)
+        return result
+        
+    def _on_pattern_done(self, key, result):
+        self.log_message(f"✓ {result}")
+        self.log_message("🎉 Triangle computation complete!")
+        
+        # Enable export button if successful
+        if "✓" in result:
+            self._can_export = True
+            if self._mesh_key is not None:
+                self._result_cache[key] = dict(self.toolchain.optimized_triangles)
+                if len(self._result_cache) > RESULT_CACHE_SIZE:
+                    self._result_cache.popitem(last=False)
+        self._finish_pattern()
+        
+    def _on_pattern_error(self, error):
+        self.log_message(f"✗ Error computing triangles: {error}")
+        self._finish_pattern()
+        
+    def _finish_pattern(self):
+        self.progress.setVisible(False)
+        self._set_busy(False)
+        
+    def _set_busy(self, busy):
+        """Disable load, compute and export while a worker is running"""
+        self._busy = busy
+        self.btn_load.setEnabled(not busy)
+        self.btn_generate.setEnabled(not busy)
+        self.btn_export.setEnabled(not busy and self._can_export)
+            
+    def export_pattern(self):
+        if not self.toolchain:
+            self.log_message("✗ Toolchain not initialized")
+            return
+            
+        filepath, selected_filter = QFileDialog.getSaveFileName(
+            self, "Export Printing Pattern", "curveup_pattern", SAVE_FILTER
+        )
+        
+        if filepath:
+            # Ensure correct file extension
+            if selected_filter == SVG_FILTER and not filepath.endswith('.svg'):
+                filepath += '.svg'
+                
+            self._set_busy(True)
+            worker = Worker(self._run_export, filepath)
+            worker.signals.finished.connect(lambda result: self._on_export_done(filepath, result))
+            worker.signals.error.connect(self._on_export_error)
+            self.threadpool.start(worker)
+            
+    def _run_export(self, filepath, progress_callback):
+        return self.toolchain.export_print_pattern(filepath)
+        
+    def _on_export_done(self, filepath, result):
+        self.log_message(f"✓ {result}")
+        self._set_busy(False)
+        
+        # Show success message
+        QMessageBox.information(self, "Export Complete", 
+                              f"Triangle mesh pattern successfully exported!\n\n"
+                              f"File: {filepath}\n"
+                              f"Stretch Factors: {self.spin_stretch_x.value():.1f}x{self.spin_stretch_y.value():.1f}\n"
+                              f"Triangles: {self.toolchain.triangle_count()}")
+        
+    def _on_export_error(self, error):
+        self.log_message(f"✗ Error exporting pattern: {error}")
+        self._set_busy(False)
+        QMessageBox.critical(self, "Export Error", f"Failed to export pattern:\n{error}")
+                
+    def log_message(self, message):
+        # Coalesce messages so the log redraws once per event-loop pass
+        if not self._pending_log:
+            QTimer.singleShot(0, self._flush_log)
+        self._pending_log.append(message)
+        
+    def _flush_log(self):
+        self.text_log.appendPlainText("\n".join(self._pending_log))
+        self._pending_log = []
@@ -1,107 +1,448 @@
 # src/parameterization.py
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from types import SimpleNamespace
 import numpy as np
 from scipy.sparse import coo_matrix
-from scipy.sparse.linalg import spsolve
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import splu, lsqr
+from kernels import cotan_weights
+
+# Meshes with more faces than this are parameterized chunk by chunk
+CHUNK_SIZE = 50000
+
+# Reduced-precision solves needing a larger relative correction are redone in float64
+F32_RESIDUAL_TOL = 1e-3
+
+# UV layouts whose area is below this fraction of their summed squared edge
+# lengths have collapsed (a well-shaped triangle scores about 0.14)
+MIN_UV_AREA_RATIO = 1e-6
+
+
+def _lscm_chunk(shm_name, shape, dtype, faces, solver, solve_dtype, init_uv):
+    """Parameterize one face chunk, returning its global vertex ids, local faces and UVs
+    
+    Runs in a worker process; the full vertex array is read from shared
+    memory so it is not pickled once per chunk.
+    """
+    vertex_ids, local_faces = np.unique(faces, return_inverse=True)
+    shm = SharedMemory(name=shm_name)
+    try:
+        vertices = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        chunk_vertices = vertices[vertex_ids]
+        del vertices
+    finally:
+        shm.close()
+    
+    local_faces = local_faces.reshape(faces.shape)
+    submesh = SimpleNamespace(vertices=chunk_vertices, faces=local_faces)
+    if init_uv is not None:
+        init_uv = init_uv[vertex_ids]
+    uv = MeshParameterizer(submesh, solve_dtype).lscm_parameterization(solver, init_uv)
+    return vertex_ids, local_faces, uv
+
 
 class MeshParameterizer:
-    def __init__(self, mesh):
+    def __init__(self, mesh, dtype=np.float64):
         self.mesh = mesh
         self.vertices = mesh.vertices
         self.faces = mesh.faces
+        self.dtype = np.dtype(dtype)
+        self._lscm_system = None
+        self._lscm_solvers = {}
+        self._last_uv = None
+        self._laplacian = None
+        self._boundary = None
+        self._conformal_factor = None
         
     def conformal_parameterization(self):
-        """Conformal parameterization using cotangent weights"""
+        """Harmonic map with cotangent weights onto the unit disk
+        
+        The boundary loop is pinned to the unit circle by arc length and the
+        interior solves L u = 0 (Tutte embedding with cotangent weights).
+        """
+        # Pin the whole boundary loop
+        boundary_vertices = self._find_boundary_vertices()
+        if len(boundary_vertices) < 3:
+            # Fallback to simple projection if no clear boundary
+            return self.vertices[:, :2]
+        
+        # Build Laplace matrix with cotangent weights
+        L = self._build_cotangent_laplacian()
+        
+        # Solve for UV coordinates
         try:
-            n_vertices = len(self.vertices)
+            uv = self._solve_parameterization(L, boundary_vertices)
+        except RuntimeError as e:
+            # SuperLU reports a singular system, e.g. from disconnected pieces
+            print(f"Conformal parameterization failed: {e}")
+            return self.vertices[:, :2]
+        
+        if self._uv_collapsed(uv):
+            print("Conformal parameterization failed: UV layout has zero area")
+            return self.vertices[:, :2]
+        return uv
+    
+    def _uv_area(self, uv):
+        """Total unsigned area of the mesh triangles in UV space"""
+        corners = uv[np.asarray(self.faces)]
+        e1 = corners[:, 1] - corners[:, 0]
+        e2 = corners[:, 2] - corners[:, 0]
+        return 0.5 * np.abs(e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]).sum()
+    
+    def _uv_collapsed(self, uv):
+        """True when the UV layout has (near) zero area for its size"""
+        corners = uv[np.asarray(self.faces)]
+        edges = corners - np.roll(corners, 1, axis=1)
+        return not self._uv_area(uv) > MIN_UV_AREA_RATIO * np.einsum('ijk,ijk->', edges, edges)
+    
+    def lscm_parameterization(self, solver="direct", init_uv=None):
+        """Least Squares Conformal Maps parameterization
+        
+        solver="direct" factorizes the normal equations once with a sparse
+        LU (reused on later calls); solver="iterative" runs LSQR instead,
+        warm-started from init_uv or the previous result if there is one.
+        
+        The solve runs in self.dtype. A float32 solve gets one float64
+        refinement step, which keeps the 225-vertex demo saddle within 1e-6
+        of float64; if the correction exceeds F32_RESIDUAL_TOL (the normal
+        equations are too ill-conditioned, as on a 60x60 saddle) the system
+        is solved again in float64.
+        
+        Meshes beyond CHUNK_SIZE faces are better served by
+        chunked_lscm_parameterization, which splits them into charts.
+        """
+        try:
+            if self._lscm_system is None:
+                self._lscm_system = self._build_lscm_system()
+            A_free, rhs, free, pinned, pinned_uv = self._lscm_system
             
-            # Build Laplace matrix with cotangent weights
-            L = self._build_cotangent_laplacian()
+            x0 = None
+            if solver == "iterative":
+                if init_uv is None:
+                    init_uv = self._last_uv
+                if init_uv is not None:
+                    x0 = np.asarray(init_uv, dtype=float).ravel(order='F')[free]
             
-            # Pin two boundary vertices
-            boundary_vertices = self._find_boundary_vertices()
-            if len(boundary_vertices) < 2:
-                # Fallback to simple projection if no clear boundary
-                return self.vertices[:, :2]
-                
-            fixed_indices = boundary_vertices[:2]
+            x = self._solve_lscm(self.dtype, solver, x0).astype(np.float64)
+            if self.dtype != np.float64:
+                # One refinement step against the float64 residual; a large
+                # correction means the reduced-precision solve cannot be trusted
+                correction = self._solve_lscm(self.dtype, "direct", None,
+                                              rhs - A_free @ x).astype(np.float64)
+                if np.linalg.norm(correction) > F32_RESIDUAL_TOL * np.linalg.norm(x):
+                    x = self._solve_lscm(np.dtype(np.float64), solver, x0)
+                else:
+                    x += correction
             
-            # Solve for UV coordinates
-            uv = self._solve_parameterization(L, fixed_indices)
-            return uv
+            n_vertices = len(self.vertices)
+            uv_flat = np.zeros(2 * n_vertices)
+            uv_flat[free] = x
+            uv_flat[pinned] = pinned_uv
+            uv = np.column_stack([uv_flat[:n_vertices], uv_flat[n_vertices:]])
+            if self._uv_collapsed(uv):
+                print("LSCM parameterization failed: UV layout has zero area")
+                return self.vertices[:, :2]
+            self._last_uv = uv
+            return self._last_uv
             
         except Exception as e:
-            print(f"Conformal parameterization failed: {e}")
-            # Fallback to simple planar projection
+            print(f"LSCM parameterization failed: {e}")
             return self.vertices[:, :2]
     
-    def lscm_parameterization(self):
-        """Least Squares Conformal Maps parameterization"""
+    def _solve_lscm(self, dtype, solver, x0, rhs=None):
+        """Solve the cached LSCM system (or another right-hand side) in the given precision"""
+        if dtype not in self._lscm_solvers:
+            A_free, b = self._lscm_system[:2]
+            self._lscm_solvers[dtype] = [A_free.astype(dtype), b.astype(dtype), None]
+        A, b, factor = self._lscm_solvers[dtype]
+        if rhs is not None:
+            b = rhs.astype(dtype)
+        
+        if solver == "direct":
+            if factor is None:
+                factor = splu((A.T @ A).tocsc())
+                self._lscm_solvers[dtype][2] = factor
+            return factor.solve(A.T @ b)
+        if solver == "iterative":
+            tol = 1e-8 if dtype == np.float64 else 1e-5
+            return lsqr(A, b, atol=tol, btol=tol, x0=x0)[0]
+        raise ValueError(f"Unknown LSCM solver: {solver}")
+    
+    def xatlas_parameterization(self):
+        """Chart segmentation, LSCM and packing in one pass with xatlas
+        
+        Returns (vmapping, faces, uv) for the seam-split mesh, where vmapping
+        maps each output vertex back to an input vertex. Falls back to a
+        single LSCM chart (or chunked LSCM charts for meshes beyond
+        CHUNK_SIZE faces) when xatlas is not installed.
+        """
+        try:
+            import xatlas
+        except ImportError:
+            print("xatlas not installed, using LSCM")
+            if len(self.faces) > CHUNK_SIZE:
+                return self.chunked_lscm_parameterization()
+            n_vertices = len(self.vertices)
+            return np.arange(n_vertices), np.asarray(self.faces), self.lscm_parameterization()
+        
+        vertices = np.ascontiguousarray(self.vertices, dtype=np.float32)
+        faces = np.ascontiguousarray(self.faces, dtype=np.uint32)
+        return xatlas.parametrize(vertices, faces)
+    
+    def chunked_lscm_parameterization(self, chunk_size=CHUNK_SIZE, progress_callback=None,
+                                      solver="direct", init_uv=None):
+        """LSCM on spatial face chunks, laid out side by side in UV space
+        
+        Returns (vmapping, faces, uv) like xatlas_parameterization: every
+        chunk is its own chart with its own copy of the seam vertices, and
+        vmapping maps each output vertex back to an input vertex. solver,
+        init_uv and the parameterizer's dtype apply to every chunk.
+        """
+        vertices = np.asarray(self.vertices, dtype=float)
+        faces = np.asarray(self.faces)
+        if init_uv is not None:
+            init_uv = np.asarray(init_uv, dtype=float)
+        
+        # Slice faces into slabs along the longest axis so each chunk is a
+        # spatially coherent patch rather than an arbitrary index range
+        centroids = vertices[faces].mean(axis=1)
+        axis = np.argmax(np.ptp(centroids, axis=0))
+        faces = faces[np.argsort(centroids[:, axis], kind='stable')]
+        chunks = [faces[start:start + chunk_size]
+                  for start in range(0, len(faces), chunk_size)]
+        
+        vmapping = []
+        chart_faces = []
+        chart_uv = []
+        n_out = 0
+        offset = 0.0
+        
+        # Solve chunks in separate processes so the Python-level assembly
+        # between SciPy calls is not serialized by the GIL
+        shm = SharedMemory(create=True, size=vertices.nbytes)
         try:
-            # For now, use a simplified approach
-            # Real LSCM would involve solving a linear system
-            return self.vertices[:, [0, 2]]  # Use X,Z coordinates
+            shared = np.ndarray(vertices.shape, dtype=vertices.dtype, buffer=shm.buf)
+            shared[:] = vertices
+            del shared
             
-        except Exception as e:
-            print(f"LSCM parameterization failed: {e}")
-            return self.vertices[:, :2]
+            # Spawn rather than fork: forking after the parallel cotangent
+            # kernel has started its thread pool hangs interpreter exit
+            with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as executor:
+                futures = [executor.submit(_lscm_chunk, shm.name, vertices.shape, vertices.dtype,
+                                           chunk, solver, self.dtype, init_uv)
+                           for chunk in chunks]
+                for i, future in enumerate(futures):
+                    vertex_ids, local_faces, uv = future.result()
+                    uv = uv - uv.min(axis=0)
+                    uv[:, 0] += offset
+                    offset = uv[:, 0].max() + 0.1 * np.ptp(uv[:, 0])
+                    
+                    vmapping.append(vertex_ids)
+                    chart_faces.append(local_faces + n_out)
+                    chart_uv.append(uv)
+                    n_out += len(vertex_ids)
+                    
+                    if progress_callback is not None:
+                        progress_callback(int(100 * (i + 1) / len(chunks)))
+        finally:
+            shm.close()
+            shm.unlink()
+        
+        return (np.concatenate(vmapping), np.concatenate(chart_faces),
+                np.concatenate(chart_uv).astype(np.float32))
+    
+    def _build_lscm_system(self):
+        """Assemble the LSCM least-squares system with two pinned vertices per piece"""
+        vertices = np.asarray(self.vertices, dtype=float)
+        faces = np.asarray(self.faces)
+        n_vertices = len(vertices)
+        n_faces = len(faces)
+        
+        # Express every triangle in its own orthonormal 2D frame
+        p0, p1, p2 = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+        e1 = p1 - p0
+        e2 = p2 - p0
+        len_e1 = np.linalg.norm(e1, axis=1)
+        x_axis = e1 / len_e1[:, None]
+        normal = np.cross(e1, e2)
+        y_axis = np.cross(normal, x_axis)
+        y_axis /= np.linalg.norm(y_axis, axis=1)[:, None]
+        
+        local = np.zeros((n_faces, 3, 2))
+        local[:, 1, 0] = len_e1
+        local[:, 2, 0] = np.einsum('ij,ij->i', e2, x_axis)
+        local[:, 2, 1] = np.einsum('ij,ij->i', e2, y_axis)
+        
+        # Complex weight of vertex j is (q[j+2] - q[j+1]) / sqrt(2 * area)
+        w = np.roll(local, -2, axis=1) - np.roll(local, -1, axis=1)
+        double_area = np.abs(local[:, 1, 0] * local[:, 2, 1])
+        w /= np.sqrt(double_area)[:, None, None]
+        w_re = w[:, :, 0]
+        w_im = w[:, :, 1]
+        
+        # Real rows: Re = sum(w_re*u - w_im*v), Im = sum(w_im*u + w_re*v)
+        face_rows = np.repeat(np.arange(n_faces), 3)
+        u_cols = faces.ravel()
+        v_cols = u_cols + n_vertices
+        rows = np.concatenate([face_rows, face_rows, face_rows + n_faces, face_rows + n_faces])
+        cols = np.concatenate([u_cols, v_cols, u_cols, v_cols])
+        data = np.concatenate([w_re.ravel(), -w_im.ravel(), w_im.ravel(), w_re.ravel()])
+        A = coo_matrix((data, (rows, cols)), shape=(2 * n_faces, 2 * n_vertices)).tocsc()
+        
+        pinned, pinned_uv = self._lscm_pins(vertices, faces)
+        free = np.setdiff1d(np.arange(2 * n_vertices), pinned)
+        
+        A_free = A[:, free]
+        rhs = -(A[:, pinned] @ pinned_uv)
+        return A_free, rhs, free, pinned, pinned_uv
+    
+    def _lscm_pins(self, vertices, faces):
+        """Pin the two extreme vertices along each connected piece's longest axis
+        
+        A piece without pins has no unique LSCM solution and collapses, so
+        every connected component (and every unused vertex) gets its own
+        pins; pieces are laid out side by side along u. The pins keep their
+        3D distance, so all pieces (and chunks) share the mesh's scale.
+        Returns the pinned columns of the [u, v] unknowns and their values.
+        """
+        n_vertices = len(vertices)
+        edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+        graph = coo_matrix((np.ones(len(edges)), (edges[:, 0], edges[:, 1])),
+                           shape=(n_vertices, n_vertices))
+        n_pieces, labels = connected_components(graph, directed=False)
+        
+        # Group vertices by piece and take per-piece bounding boxes
+        order = np.argsort(labels, kind='stable')
+        starts = np.searchsorted(labels[order], np.arange(n_pieces))
+        stops = np.append(starts[1:], n_vertices)
+        lo = np.minimum.reduceat(vertices[order], starts, axis=0)
+        hi = np.maximum.reduceat(vertices[order], starts, axis=0)
+        axis = np.argmax(hi - lo, axis=1)
+        
+        # Sort every piece's vertices along its own axis: first and last are the extremes
+        coord = vertices[np.arange(n_vertices), axis[labels]]
+        by_coord = np.lexsort((coord, labels))
+        i0 = by_coord[starts]
+        i1 = by_coord[stops - 1]
+        
+        # Space pieces by their bounding-box diagonal plus a 10% gap
+        spacing = 1.1 * np.linalg.norm(hi - lo, axis=1)
+        offset = np.concatenate([[0.0], np.cumsum(spacing)[:-1]])
+        length = np.linalg.norm(vertices[i1] - vertices[i0], axis=1)
+        two = i0 != i1
+        pinned = np.concatenate([i0, i1[two], i0 + n_vertices, i1[two] + n_vertices])
+        pinned_uv = np.concatenate([offset, offset[two] + length[two],
+                                    np.zeros(n_pieces + two.sum())])
+        return pinned, pinned_uv
     
     def _build_cotangent_laplacian(self):
-        """Build cotangent weight Laplacian matrix (simplified)"""
+        """Build cotangent weight Laplacian matrix
+        
+        The matrix is reused until the vertex or face array is replaced.
+        """
+        if (self._laplacian is not None and self._laplacian[0] is self.vertices
+                and self._laplacian[1] is self.faces):
+            return self._laplacian[2]
         n_vertices = len(self.vertices)
         
-        # Simplified uniform weights for now
-        # Real implementation would compute cotangent weights
-        row_ind = []
-        col_ind = []
-        data = []
-        
-        for face in self.faces:
-            for i in range(3):
-                v1 = face[i]
-                v2 = face[(i + 1) % 3]
-                
-                # Add uniform weights (simplified)
-                row_ind.extend([v1, v2])
-                col_ind.extend([v2, v1])
-                data.extend([-1, -1])
-        
-        # Create sparse matrix
-        L = coo_matrix((data, (row_ind, col_ind)), shape=(n_vertices, n_vertices))
-        
-        # Set diagonal to negative sum of row
-        row_sum = np.array(L.sum(axis=1)).flatten()
-        L.setdiag(-row_sum)
+        # Per-corner cotangent weights from the compiled kernel, computed in
+        # the solve precision; the matrix itself is always float64
+        rows, cols, weights = cotan_weights(self.vertices, self.faces, self.dtype)
+        weights = weights.astype(np.float64, copy=False)
+        # Degenerate faces with a repeated vertex give self-edges whose huge
+        # weights would only cancel inexactly below
+        weights[rows == cols] = 0.0
+        
+        # Each edge weight w adds -w to (i, j) and (j, i) and +w to (i, i) and
+        # (j, j), so the diagonal row sums come out of the same duplicate
+        # summation as the off-diagonal entries
+        row_ind = np.concatenate([rows, cols, rows, cols])
+        col_ind = np.concatenate([cols, rows, rows, cols])
+        data = np.concatenate([-weights, -weights, weights, weights])
         
+        # Create sparse matrix; duplicate entries are summed on conversion
+        L = coo_matrix((data, (row_ind, col_ind)), shape=(n_vertices, n_vertices)).tocsr()
+        self._laplacian = (self.vertices, self.faces, L)
         return L
     
     def _find_boundary_vertices(self):
-        """Find boundary vertices for pinning"""
-        # Simplified: return first few vertices
-        return [0, min(1, len(self.vertices)-1)]
+        """Find the boundary loop used for pinning
+        
+        Boundary edges belong to exactly one face. Returns the vertices of
+        the longest boundary loop in walking order; a closed mesh has none.
+        The result is reused until the vertex or face array is replaced.
+        """
+        if (self._boundary is not None and self._boundary[0] is self.vertices
+                and self._boundary[1] is self.faces):
+            return self._boundary[2]
+        
+        # Count each undirected edge through one int64 key per edge, which
+        # sorts far faster than unique rows
+        faces = np.asarray(self.faces, dtype=np.int64)
+        edges = np.sort(np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]), axis=1)
+        n_vertices = len(self.vertices)
+        keys, counts = np.unique(edges[:, 0] * n_vertices + edges[:, 1], return_counts=True)
+        boundary_keys = keys[counts == 1]
+        boundary = self._boundary_loop(boundary_keys // n_vertices, boundary_keys % n_vertices)
+        self._boundary = (self.vertices, self.faces, boundary)
+        return boundary
     
-    def _solve_parameterization(self, L, fixed_indices):
-        """Solve linear system for parameterization"""
+    def _boundary_loop(self, a, b):
+        """Walk the boundary edges (a[k], b[k]) and return the longest loop"""
         n_vertices = len(self.vertices)
+        ends = np.concatenate([a, b])
+        order = np.argsort(ends, kind='stable')
+        neighbors = np.concatenate([b, a])[order]
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(ends, minlength=n_vertices))])
         
-        # Set up boundary conditions
-        fixed_u = np.zeros(n_vertices)
-        fixed_v = np.zeros(n_vertices)
-        
-        # Pin first vertex at (0,0), second at (1,0)
-        if len(fixed_indices) >= 2:
-            fixed_u[fixed_indices[0]] = 0
-            fixed_v[fixed_indices[0]] = 0
-            fixed_u[fixed_indices[1]] = 1
-            fixed_v[fixed_indices[1]] = 0
+        visited = np.zeros(n_vertices, dtype=bool)
+        longest = []
+        for start in np.unique(ends):
+            if visited[start]:
+                continue
+            loop = [start]
+            visited[start] = True
+            prev, current = -1, start
+            while True:
+                step = [v for v in neighbors[indptr[current]:indptr[current + 1]]
+                        if v != prev and not visited[v]]
+                if not step:
+                    break
+                prev, current = current, step[0]
+                visited[current] = True
+                loop.append(current)
+            if len(loop) > len(longest):
+                longest = loop
+        return np.array(longest, dtype=np.int64)
+    
+    def _solve_parameterization(self, L, fixed_indices):
+        """Solve L u = 0 and L v = 0 with the fixed loop pinned to the unit circle"""
+        n_vertices = len(self.vertices)
+        L = L.tocsr()
         
-        # Solve for U and V coordinates (simplified)
-        # Real implementation would solve (L u = 0) with boundary conditions
-        u_coords = np.zeros(n_vertices)
-        v_coords = np.zeros(n_vertices)
+        # Space the loop vertices around the circle by arc length
+        fixed = np.asarray(fixed_indices)
+        points = np.asarray(self.vertices, dtype=float)[fixed]
+        segments = np.linalg.norm(np.roll(points, -1, axis=0) - points, axis=1)
+        angle = 2 * np.pi * np.concatenate([[0.0], np.cumsum(segments)[:-1]]) / segments.sum()
+        fixed_uv = np.column_stack([np.cos(angle), np.sin(angle)])
+        # Vertices used by no face have an empty row; leave them at the origin
+        free = np.bincount(np.asarray(self.faces).ravel(), minlength=n_vertices) > 0
+        free[fixed] = False
         
-        # Simple linear assignment based on vertex indices
-        for i in range(n_vertices):
-            u_coords[i] = i / max(n_vertices, 1)
-            v_coords[i] = (i % 10) / 10.0  # Some variation in V
+        # Move the pinned columns to the right-hand side and factorize the
+        # reduced matrix once for both coordinates (and for later calls with
+        # the same matrix and pins)
+        L_free = L[free]
+        rhs = -(L_free[:, fixed] @ fixed_uv)
+        if (self._conformal_factor is None or self._conformal_factor[0] is not L
+                or not np.array_equal(self._conformal_factor[1], fixed)):
+            self._conformal_factor = (L, fixed, splu(L_free[:, free].tocsc()))
+        lu = self._conformal_factor[2]
         
-        return np.column_stack([u_coords, v_coords])
+        uv = np.zeros((n_vertices, 2))
+        uv[fixed] = fixed_uv
+        uv[free] = lu.solve(np.asfortranarray(rhs))
+        return uv
@@ -0,0 +1,40 @@
+# src/worker.py
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot
+
+# Set by the --debug command line flag to print worker tracebacks
+DEBUG = False
+
+
+class WorkerSignals(QObject):
+    """Signals emitted by a Worker while it runs on the thread pool"""
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+    progress = pyqtSignal(int)
+
+
+class Worker(QRunnable):
+    """Run a toolchain call off the Qt main thread
+
+    The wrapped function receives a ``progress_callback`` keyword argument
+    and returns the toolchain's status message, or a tuple that starts
+    with it.
+    """
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self.kwargs['progress_callback'] = self.signals.progress.emit
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            if DEBUG:
+                import traceback
+                traceback.print_exc()
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(result)